@@ -1,15 +1,12 @@
 from supabase import create_client, Client
+import asyncio
 from datetime import datetime, timezone
 import logging
 from typing import Dict, List, Tuple, Optional, Union, Any
 from config import Config
-from utils import retry_on_error, structured_logger, get_ist_time
+from utils import retry_on_error, structured_logger, get_ist_time, get_ist_date
 
-# Set up logging
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Set up logging (handlers are configured by utils.setup_logging)
 logger = logging.getLogger(__name__)
 
 # Initialize Supabase client
@@ -23,12 +20,27 @@ class TransactionError(DatabaseError):
     """Exception for transaction-related errors"""
     pass
 
+# Match numbers that already have a result in history, loaded once and kept in
+# sync by update_points/undo_last_points_update/clear_points
+_recorded_matches: Optional[set] = None
+
+def load_recorded_matches() -> set:
+    """Load the set of match numbers that already have a result recorded"""
+    global _recorded_matches
+    try:
+        response = supabase.table('history').select('match_number').execute()
+        _recorded_matches = {item['match_number'] for item in response.data}
+        return _recorded_matches
+    except Exception as e:
+        logger.error(f"Error loading recorded matches: {str(e)}")
+        raise DatabaseError(f"Failed to load recorded matches: {str(e)}")
+
 @retry_on_error(max_retries=3, delay=1)
 async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
     """Execute a list of database operations in a transaction"""
     try:
         # Start transaction
-        structured_logger.info("Starting database transaction", {"operations": len(operations)})
+        structured_logger.info("Starting database transaction", context={"operations": len(operations)})
         
         # Execute each operation
         for op in operations:
@@ -39,7 +51,7 @@ async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
             
             try:
                 if action == 'insert':
-                    response = supabase.table(table).insert(data).execute()
+                    response = await asyncio.to_thread(supabase.table(table).insert(data).execute)
                     if not response.data:
                         raise TransactionError(f"Failed to insert into {table}")
                         
@@ -47,12 +59,12 @@ async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
                     query = supabase.table(table).update(data)
                     for key, value in conditions.items():
                         query = query.eq(key, value)
-                    response = query.execute()
+                    response = await asyncio.to_thread(query.execute)
                     if not response.data:
                         raise TransactionError(f"Failed to update {table}")
                         
                 elif action == 'upsert':
-                    response = supabase.table(table).upsert(data).execute()
+                    response = await asyncio.to_thread(supabase.table(table).upsert(data).execute)
                     if not response.data:
                         raise TransactionError(f"Failed to upsert into {table}")
                         
@@ -60,7 +72,7 @@ async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
                     query = supabase.table(table).delete()
                     for key, value in conditions.items():
                         query = query.eq(key, value)
-                    response = query.execute()
+                    response = await asyncio.to_thread(query.execute)
                     
                 else:
                     raise ValueError(f"Invalid action: {action}")
@@ -68,7 +80,7 @@ async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
             except Exception as e:
                 structured_logger.error(
                     "Error executing database operation",
-                    {
+                    context={
                         "table": table,
                         "action": action,
                         "error": str(e)
@@ -79,7 +91,7 @@ async def execute_in_transaction(operations: List[Dict[str, Any]]) -> None:
         structured_logger.info("Transaction completed successfully")
         
     except Exception as e:
-        structured_logger.error("Transaction failed", {"error": str(e)})
+        structured_logger.error("Transaction failed", context={"error": str(e)})
         raise TransactionError(f"Transaction failed: {str(e)}")
 
 @retry_on_error(max_retries=3, delay=1)
@@ -97,13 +109,15 @@ def init_db() -> None:
                 structured_logger.info(f"Successfully connected to {table} table")
                 
             except Exception as e:
-                structured_logger.error(f"Error accessing {table} table", {"error": str(e)})
+                structured_logger.error(f"Error accessing {table} table", context={"error": str(e)})
                 raise DatabaseError(f"Failed to access {table} table: {str(e)}")
                 
+        load_recorded_matches()
+        
         structured_logger.info("Database initialization completed successfully")
         
     except Exception as e:
-        structured_logger.error("Database initialization failed", {"error": str(e)})
+        structured_logger.error("Database initialization failed", context={"error": str(e)})
         raise DatabaseError(f"Failed to initialize database: {str(e)}")
 
 def get_points(user_id: Optional[int] = None) -> Union[Dict[str, int], int]:
@@ -123,12 +137,23 @@ def get_points(user_id: Optional[int] = None) -> Union[Dict[str, int], int]:
         logger.error(f"Error getting points: {str(e)}")
         raise DatabaseError(f"Failed to get points: {str(e)}")
 
+def get_leaderboard() -> List[Tuple[str, int]]:
+    """Get (username, points) pairs for all users, highest points first"""
+    try:
+        response = supabase.table('points').select('username,user_points').order('user_points', desc=True).execute()
+        return [(item['username'], item['user_points']) for item in response.data]
+    except Exception as e:
+        logger.error(f"Error getting leaderboard: {str(e)}")
+        raise DatabaseError(f"Failed to get leaderboard: {str(e)}")
+
 @retry_on_error(max_retries=3, delay=1)
 async def update_points(username: str, points: int, match_number: int, updated_by: str) -> None:
     """Update points for a user and record in history"""
     try:
         # Get current points
-        current_points = supabase.table('points').select('user_points').eq('username', username).execute()
+        current_points = await asyncio.to_thread(
+            supabase.table('points').select('user_points').eq('username', username).execute
+        )
         
         # Prepare transaction operations
         operations = []
@@ -167,10 +192,12 @@ async def update_points(username: str, points: int, match_number: int, updated_b
         
         # Execute all operations in a transaction
         await execute_in_transaction(operations)
+        if _recorded_matches is not None:
+            _recorded_matches.add(match_number)
         
         structured_logger.info(
             "Points updated successfully",
-            {
+            context={
                 "username": username,
                 "points": points,
                 "match_number": match_number,
@@ -181,7 +208,7 @@ async def update_points(username: str, points: int, match_number: int, updated_b
     except Exception as e:
         structured_logger.error(
             "Error updating points",
-            {
+            context={
                 "username": username,
                 "points": points,
                 "match_number": match_number,
@@ -199,31 +226,30 @@ def clear_points() -> None:
         
         # Clear history table
         supabase.table('history').delete().neq('username', '').execute()
+        if _recorded_matches is not None:
+            _recorded_matches.clear()
     except Exception as e:
-        structured_logger.error("Error clearing points", {"error": str(e)})
+        structured_logger.error("Error clearing points", context={"error": str(e)})
         raise DatabaseError(f"Failed to clear points: {str(e)}")
 
 def undo_last_points_update() -> Tuple[bool, str]:
     """Undo the last points update"""
     try:
-        # Get last history entry
-        last_entry = supabase.table('history').select('*').order('timestamp', desc=True).limit(1).execute()
+        # Pop the latest history row and take its points back in one round trip
+        # (see undo_last_points_update in supabase_setup.sql)
+        response = supabase.rpc('undo_last_points_update', {}).execute()
         
-        if not last_entry.data:
+        if not response.data:
             return False, "No points to undo"
         
-        entry = last_entry.data[0]
+        entry = response.data[0]
         
-        # Update points
-        current_points = supabase.table('points').select('user_points').eq('username', entry['username']).execute()
-        if current_points.data:
-            new_points = current_points.data[0]['user_points'] - entry['points']
-            supabase.table('points').update({'user_points': new_points}).eq('username', entry['username']).execute()
+        # Admins may record several winners for one match, so only forget the
+        # match once no history row for it remains
+        if _recorded_matches is not None and not entry['match_still_recorded']:
+            _recorded_matches.discard(entry['undone_match_number'])
         
-        # Delete the history entry
-        supabase.table('history').delete().eq('id', entry['id']).execute()
-        
-        return True, f"Undid {entry['points']} point(s) for {entry['username']}"
+        return True, f"Undid {entry['undone_points']} point(s) for {entry['undone_username']}"
     except Exception as e:
         logger.error(f"Error undoing points update: {str(e)}")
         raise DatabaseError(f"Failed to undo points update: {str(e)}")
@@ -256,6 +282,22 @@ def get_match_results() -> List[Tuple[int, str, str, str]]:
         logger.error(f"Error getting match results: {str(e)}")
         raise DatabaseError(f"Failed to get match results: {str(e)}")
 
+def get_recent_match_results(limit: int = 5) -> List[Tuple[int, str, str, str]]:
+    """Get the results for the highest-numbered matches, latest first"""
+    try:
+        response = supabase.table('history').select(
+            'match_number, username, timestamp, updated_by'
+        ).order('match_number', desc=True).limit(limit).execute()
+        
+        return [
+            (entry['match_number'], entry['username'], entry['timestamp'], entry['updated_by'])
+            for entry in response.data
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error getting recent match results: {str(e)}")
+        raise DatabaseError(f"Failed to get recent match results: {str(e)}")
+
 def get_user_match_wins(user_id: int) -> List[Tuple[int, str, str, str]]:
     """Get all matches won by a specific user"""
     try:
@@ -309,7 +351,7 @@ def get_user_stats(user_id: int) -> List[Tuple[int, bool, List[Tuple[int, str, s
         return [(points, alert, recent_wins)]
         
     except Exception as e:
-        structured_logger.error("Error getting user stats", {"error": str(e)})
+        structured_logger.error("Error getting user stats", context={"error": str(e)})
         raise DatabaseError(f"Failed to get user stats: {str(e)}")
 
 def get_user_alert_preference(user_id: int) -> bool:
@@ -323,13 +365,14 @@ def get_user_alert_preference(user_id: int) -> bool:
         logger.error(f"Error getting user alert preference: {str(e)}")
         raise DatabaseError(f"Failed to get user alert preference: {str(e)}")
 
-def set_user_alert_preference(user_id: int, enabled: bool) -> bool:
-    """Set or update user's alert preference"""
+def set_user_alert_preference(user_id: int, enabled: bool, channel_id: Optional[int] = None) -> bool:
+    """Set or update user's alert preference (channel_id set means alert in that channel instead of DM)"""
     try:
         # Upsert alert preference
         response = supabase.table('user_alerts').upsert({
             'user_id': user_id,
             'enabled': enabled,
+            'channel_id': channel_id,
             'updated_at': datetime.now(timezone.utc).isoformat()
         }).execute()
         
@@ -347,31 +390,33 @@ def get_users_with_alerts() -> List[int]:
         logger.error(f"Error getting users with alerts: {str(e)}")
         raise DatabaseError(f"Failed to get users with alerts: {str(e)}")
 
-def has_used_win_today(match_number: int) -> bool:
-    """Check if a record already exists for this match in history"""
+def get_alert_subscriptions() -> Dict[int, Optional[int]]:
+    """Get all users with alerts enabled, mapped to their alert channel (None for DM)"""
     try:
-        # Check history for any entries with this match number
-        response = supabase.table('history').select('match_number').eq('match_number', match_number).execute()
-        
-        # If any records exist for this match number, return True
-        return len(response.data) > 0
-        
+        response = supabase.table('user_alerts').select('user_id,channel_id').eq('enabled', True).execute()
+        return {item['user_id']: item.get('channel_id') for item in response.data}
     except Exception as e:
-        logger.error(f"Error checking match history: {str(e)}")
-        raise DatabaseError(f"Failed to check match history: {str(e)}")
+        logger.error(f"Error getting alert subscriptions: {str(e)}")
+        raise DatabaseError(f"Failed to get alert subscriptions: {str(e)}")
+
+def has_used_win_today(match_number: int) -> bool:
+    """Check if a record already exists for this match in history"""
+    # Served from the in-memory set loaded by init_db; never queries the database,
+    # so it is safe to call on the event loop
+    if _recorded_matches is None:
+        logger.error("Recorded matches checked before init_db loaded them")
+        raise DatabaseError("Recorded matches not loaded; init_db must run first")
+    return match_number in _recorded_matches
 
 def is_match_today(match_number: int, schedule: dict) -> bool:
     """Check if a match is scheduled for today"""
     try:
         # Get today's date in IST
-        today = get_ist_time().date()
+        today = get_ist_date()
         
         # Check if match is in today's schedule
-        for match_no, match_info in schedule.items():
-            if match_no == match_number and match_info['date'].date() == today:
-                return True
-                
-        return False
+        match_info = schedule.get(match_number)
+        return match_info is not None and match_info.date_only == today
         
     except Exception as e:
         logger.error(f"Error checking match schedule: {str(e)}")
@@ -1,24 +1,29 @@
 import discord
-from discord.ext import commands
-from discord import app_commands
 import asyncio
 import logging
-from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, List
+from datetime import datetime, date
+from typing import Optional, Dict, List, Tuple, NamedTuple
 import re
 import csv
+from functools import lru_cache
+import bisect
+import random
+import sys
+import weakref
+from pathlib import Path
 from config import Config
 from database import (
     init_db,
-    get_points,
+    DatabaseError,
+    get_leaderboard,
     update_points,
     clear_points,
     undo_last_points_update,
     get_match_results,
+    get_recent_match_results,
     get_user_alert_preference,
     set_user_alert_preference,
-    get_users_with_alerts,
-    get_user_match_wins,
+    get_alert_subscriptions,
     get_user_stats,
     has_used_win_today,
     is_match_today
@@ -26,17 +31,16 @@ from database import (
 from utils import (
     setup_logging,
     is_admin,
-    validate_input,
-    format_points,
     get_command_cooldown,
     check_rate_limit,
-    is_mention,
     format_username,
     get_ist_time,
-    convert_to_ist
+    get_ist_date,
+    convert_to_ist,
+    IST_TIMEZONE,
+    AsyncRateLimiter
 )
 import time
-import pytz
 
 # Set up logging
 logger = setup_logging()
@@ -58,45 +62,161 @@ try:
     init_db()
     logger.info("Database initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize database: {e}")
+    logger.error("Failed to initialize database: %s", e)
     raise
 
-# Initialize command cooldown tracking
-last_command_time = 0
+# Initialize command cooldown tracking (per-user, monotonic clock)
+_cooldowns: dict[int, float] = {}
+_cooldowns_pruned_at = 0.0
+COOLDOWN_PRUNE_INTERVAL = 600  # seconds
 logger.info("Command cooldown tracking initialized")
 
+def check_command_cooldown(user_id: int) -> bool:
+    """Return True if the user is allowed to issue another command"""
+    global _cooldowns_pruned_at
+    now = time.monotonic()
+    if now - _cooldowns.get(user_id, float('-inf')) < Config.COMMAND_COOLDOWN:
+        return False
+    _cooldowns[user_id] = now
+    
+    # Periodically drop users whose cooldown expired long ago
+    if now - _cooldowns_pruned_at > COOLDOWN_PRUNE_INTERVAL:
+        cutoff = now - Config.COMMAND_COOLDOWN * 10
+        for uid in [uid for uid, ts in _cooldowns.items() if ts < cutoff]:
+            del _cooldowns[uid]
+        _cooldowns_pruned_at = now
+    return True
+
+# User stats are reused for up to STATS_CACHE_TTL seconds; every write bumps
+# _stats_version so results fetched before the write are never served after it
+STATS_CACHE_TTL = 10  # seconds
+_stats_version = 0
+
+@lru_cache(maxsize=1024)
+def _cached_user_stats(user_id: int, version: int, bucket: int):
+    return get_user_stats(user_id)
+
+def cached_user_stats(user_id: int):
+    """Get user stats, reusing a recent result for bursts of !mystats"""
+    return _cached_user_stats(user_id, _stats_version, int(time.monotonic() // STATS_CACHE_TTL))
+
+def bump_stats_version():
+    """Invalidate cached user stats after a write"""
+    global _stats_version
+    _stats_version += 1
+    _cached_user_stats.cache_clear()  # Old-version entries can never be hit again
+
+# Team name to acronym mapping
+TEAM_ACRONYMS = {
+    "Kolkata Knight Riders": "KKR",
+    "Royal Challengers Bengaluru": "RCB",
+    "Sunrisers Hyderabad": "SRH",
+    "Rajasthan Royals": "RR",
+    "Chennai Super Kings": "CSK",
+    "Mumbai Indians": "MI",
+    "Delhi Capitals": "DC",
+    "Lucknow Super Giants": "LSG",
+    "Gujarat Titans": "GT",
+    "Punjab Kings": "PBKS"
+}
+
+# Normalizes "7:30PM" / "7:30 pm" to "7:30 PM" so one strptime format covers both
+_AMPM_RE = re.compile(r'\s*([AaPp][Mm])$')
+
+class Match(NamedTuple):
+    """A scheduled IPL match, with derived fields precomputed at load time"""
+    date: datetime
+    day: str
+    start: str  # "HH:MM" in IST
+    home: str
+    away: str
+    venue: str
+    alert: bool
+    epoch: Optional[int]  # Start time as epoch seconds, None if the time failed to parse
+    match_datetime: Optional[datetime]
+    date_only: date
+    home_acr: str
+    away_acr: str
+    match_details: str  # "HOME vs AWAY" using team acronyms
+
+# Match numbers indexed by match date, populated by load_schedule
+_matches_by_date: Dict[date, List[int]] = {}
+
+def matches_on(d: date) -> List[int]:
+    """Get the match numbers scheduled on a given date"""
+    return _matches_by_date.get(d, [])
+
 # Load IPL 2025 Schedule
+# Resolved next to this file so the bot can be started from any working directory
+SCHEDULE_PATH = Path(__file__).with_name('IPL_2025_SEASON_SCHEDULE.csv')
+
 def load_schedule():
     try:
         schedule = {}
-        with open('IPL_2025_SEASON_SCHEDULE.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                match_no = int(row['Match No'])
+        # Read the whole (small) file in one call and split it into lines
+        lines = SCHEDULE_PATH.read_text(encoding='utf-8').splitlines()
+        if lines:
+            # The schedule has a fixed, unquoted layout, so plain str.split is enough;
+            # rows containing quotes fall back to the csv module
+            header = lines[0].split(',')
+            idx = {name: i for i, name in enumerate(header)}
+            alert_idx = idx.get('Alert')
+            # Only a handful of distinct start times exist, so parse each once
+            parsed_times = {}
+            for line in lines[1:]:
+                if not line:
+                    continue
+                row = next(csv.reader([line])) if '"' in line else line.split(',')
+                
+                match_no = int(row[idx['Match No']])
                 # Convert time format from "7:30 PM" to "19:30"
-                time_str = row['Start']
-                try:
-                    # Parse the time with AM/PM format
-                    time_obj = datetime.strptime(time_str, '%I:%M %p')
+                time_str = row[idx['Start']]
+                date_obj = datetime.fromisoformat(row[idx['Date']])
+                if time_str not in parsed_times:
+                    try:
+                        # Parse the time with AM/PM format
+                        parsed_times[time_str] = datetime.strptime(_AMPM_RE.sub(r' \1', time_str), '%I:%M %p')
+                    except ValueError:
+                        parsed_times[time_str] = None
+                time_obj = parsed_times[time_str]
+                
+                if time_obj is not None:
                     # Convert to 24-hour format
-                    time_24h = time_obj.strftime('%H:%M')
-                except ValueError as e:
-                    logger.error(f"Error parsing time '{time_str}' for match {match_no}: {e}")
+                    time_24h = f"{time_obj.hour:02d}:{time_obj.minute:02d}"
+                    # Match start as epoch seconds (schedule times are IST)
+                    match_datetime = IST_TIMEZONE.localize(datetime.combine(date_obj.date(), time_obj.time()))
+                    epoch = int(match_datetime.timestamp())
+                else:
+                    logger.error("Error parsing time '%s' for match %s", time_str, match_no)
                     time_24h = time_str  # Keep original if parsing fails
+                    match_datetime = None
+                    epoch = None
+                
+                home = row[idx['Home']].strip()
+                away = row[idx['Away']].strip()
+                home_acr = TEAM_ACRONYMS.get(home, home)
+                away_acr = TEAM_ACRONYMS.get(away, away)
                 
-                schedule[match_no] = {
-                    'date': datetime.strptime(row['Date'], '%Y-%m-%d'),
-                    'day': row['Day'],
-                    'start': time_24h,
-                    'home': row['Home'],
-                    'away': row['Away'],
-                    'venue': row['Venue'],
-                    'alert': row.get('Alert', 'false').lower() == 'true'  # Read alert column, default to false
-                }
-        logger.info(f"Successfully loaded schedule with {len(schedule)} matches")
+                schedule[match_no] = Match(
+                    date=date_obj,
+                    day=row[idx['Day']],
+                    start=time_24h,
+                    home=home,
+                    away=away,
+                    venue=row[idx['Venue']],
+                    alert=alert_idx is not None and row[alert_idx].lower() == 'true',  # Read alert column, default to false
+                    epoch=epoch,
+                    match_datetime=match_datetime,
+                    date_only=date_obj.date(),
+                    home_acr=home_acr,
+                    away_acr=away_acr,
+                    match_details=f"{home_acr} vs {away_acr}"
+                )
+                _matches_by_date.setdefault(date_obj.date(), []).append(match_no)
+        logger.info("Successfully loaded schedule with %s matches", len(schedule))
         return schedule
     except Exception as e:
-        logger.error(f"Failed to load schedule: {e}")
+        logger.error("Failed to load schedule: %s", e)
         raise
 
 # Load schedule at startup
@@ -104,109 +224,273 @@ try:
     IPL_2025_SCHEDULE = load_schedule()
     logger.info("IPL schedule loaded successfully")
 except Exception as e:
-    logger.error(f"Failed to load IPL schedule: {e}")
+    logger.error("Failed to load IPL schedule: %s", e)
     raise
 
-# Team name to acronym mapping
-TEAM_ACRONYMS = {
-    "Kolkata Knight Riders": "KKR",
-    "Royal Challengers Bengaluru": "RCB",
-    "Sunrisers Hyderabad": "SRH",
-    "Rajasthan Royals": "RR",
-    "Chennai Super Kings": "CSK",
-    "Mumbai Indians": "MI",
-    "Delhi Capitals": "DC",
-    "Lucknow Super Giants": "LSG",
-    "Gujarat Titans": "GT",
-    "Punjab Kings": "PBKS"
-}
+# Cache of users with alerts enabled, refreshed every ALERTS_CACHE_TTL seconds
+ALERTS_CACHE_TTL = 300  # seconds
+_alerts_cache = {'ts': 0.0, 'users': None, 'version': -1}
+_alerts_version = 0  # Bumped whenever a user changes their alert preference
+
+def bump_alerts_version():
+    """Invalidate the cached alert subscriptions"""
+    global _alerts_version
+    _alerts_version += 1
+
+# Set when a user changes their alert preference so the alert task re-checks recipients
+# (created in setup_hook so it binds to the client's event loop)
+_alerts_changed: Optional[asyncio.Event] = None
+
+async def sleep_or_alerts_changed(delay: float):
+    """Sleep for delay seconds, waking early if any user changes their alert preference"""
+    try:
+        await asyncio.wait_for(_alerts_changed.wait(), timeout=max(0, delay))
+    except asyncio.TimeoutError:
+        pass
+    _alerts_changed.clear()
+
+# Send match alerts this many seconds before the start
+ALERT_LEAD_TIME = 1800
+
+# Longest single sleep in the alert task before the wall clock is re-read
+ALERT_MAX_SLEEP = 3600
+
+# Matches that have already had their alert sent
+_alerted_matches: set[int] = set()
+
+def cached_users_with_alerts(ttl: int = ALERTS_CACHE_TTL) -> Dict[int, Optional[int]]:
+    """Get users with alerts enabled mapped to their alert channel, hitting the database at most once per ttl"""
+    now = time.monotonic()
+    if _alerts_cache['version'] != _alerts_version or now - _alerts_cache['ts'] > ttl:
+        # Record the version seen before the query so a change made mid-fetch still forces a refresh
+        version = _alerts_version
+        _alerts_cache.update(users=get_alert_subscriptions(), ts=now, version=version)
+    return _alerts_cache['users']
+
+# Alert DMs are paced to stay under Discord's rate limits
+ALERT_SEND_CONCURRENCY = 10
+ALERT_SEND_RETRIES = 3
+ALERT_MENTIONS_PER_MESSAGE = 50  # Keeps channel alerts under Discord's 2000 character limit
+alert_send_limiter = AsyncRateLimiter(max_rate=5, time_period=1)
+
+# Discord users looked up for alert DMs, kept across alerts
+_user_cache: Dict[int, discord.User] = {}
+
+async def get_discord_user(user_id: int) -> discord.User:
+    """Get a Discord user from the local caches, falling back to the REST API"""
+    user = _user_cache.get(user_id) or client.get_user(user_id)
+    if user is None:
+        # REST lookups count against the same rate limit as the alert sends
+        async with alert_send_limiter:
+            user = await client.fetch_user(user_id)
+    _user_cache[user_id] = user
+    return user
+
+# Sorted (alert_epoch, match_no) pairs for matches with alerts enabled
+ALERT_EVENTS: List[Tuple[int, int]] = sorted(
+    (match_info.epoch - ALERT_LEAD_TIME, match_no)
+    for match_no, match_info in IPL_2025_SCHEDULE.items()
+    if match_info.alert and match_info.epoch is not None
+)
+
+async def send_alert_message(destination, content: str):
+    """Send an alert message, backing off and retrying when Discord responds with 429"""
+    for attempt in range(ALERT_SEND_RETRIES):
+        try:
+            async with alert_send_limiter:
+                return await destination.send(content)
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == ALERT_SEND_RETRIES - 1:
+                raise
+            retry_after = float(e.response.headers.get('Retry-After', 1))
+            logger.warning("Rate limited sending alert, retrying in %.2f seconds", retry_after)
+            await asyncio.sleep(retry_after + random.random() * 0.1)
+
+def format_match_alert(match_no: int) -> str:
+    """Build the alert text for a match"""
+    match_info = IPL_2025_SCHEDULE[match_no]
+    return (
+        f"🔔 Match Alert!\n"
+        f"Match {match_no}: {match_info.match_details}\n"
+        f"Starting at {match_info.start} IST!\n"
+        f"Venue: {match_info.venue}"
+    )
+
+def is_transient_send_error(error: BaseException) -> bool:
+    """True for send failures worth retrying (rate limits, Discord 5xx, network errors)"""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, OSError))
+
+async def send_match_alerts(match_nos: List[int], users_with_alerts: Dict[int, Optional[int]]) -> Dict[int, Optional[int]]:
+    """Send alerts for one or more matches to every user with alerts enabled
+    
+    Users who enabled alerts in a channel share one message per channel mentioning
+    each of them; everyone else gets a DM. Returns the recipients whose alert failed
+    with a transient error, so the caller can retry just those.
+    """
+    alert_message = "\n\n".join(format_match_alert(match_no) for match_no in match_nos)
+    
+    # Group users by the channel they asked to be alerted in
+    dm_user_ids = []
+    channel_user_ids: Dict[int, List[int]] = {}
+    for user_id, channel_id in users_with_alerts.items():
+        if channel_id and client.get_channel(channel_id) is not None:
+            channel_user_ids.setdefault(channel_id, []).append(user_id)
+        else:
+            dm_user_ids.append(user_id)
+    
+    failed: Dict[int, Optional[int]] = {}
+    successful_sends = 0
+    semaphore = asyncio.Semaphore(ALERT_SEND_CONCURRENCY)
+    
+    def record_failure(user_ids: List[int], error: BaseException, target: str):
+        logger.error("Error sending alert to %s: %s", target, error, exc_info=False)
+        if is_transient_send_error(error):
+            for user_id in user_ids:
+                failed[user_id] = users_with_alerts[user_id]
+    
+    async def send_dm(user_id: int):
+        nonlocal successful_sends
+        async with semaphore:
+            try:
+                user = await get_discord_user(user_id)
+                await send_alert_message(user, alert_message)
+            except Exception as e:
+                record_failure([user_id], e, f"user {user_id}")
+            else:
+                successful_sends += 1
+    
+    async def send_channel(channel_id: int, user_ids: List[int]):
+        nonlocal successful_sends
+        channel = client.get_channel(channel_id)
+        # Each mention batch is its own message, so only a failed batch is retried
+        for i in range(0, len(user_ids), ALERT_MENTIONS_PER_MESSAGE):
+            batch = user_ids[i:i + ALERT_MENTIONS_PER_MESSAGE]
+            mentions = " ".join(f"<@{user_id}>" for user_id in batch)
+            try:
+                await send_alert_message(channel, f"{alert_message}\n{mentions}")
+            except Exception as e:
+                record_failure(batch, e, f"channel {channel_id}")
+            else:
+                successful_sends += len(batch)
+    
+    # Send alerts, overlapping requests within the Discord rate limits
+    await asyncio.gather(*(send_dm(user_id) for user_id in dm_user_ids))
+    await asyncio.gather(*(send_channel(channel_id, user_ids) for channel_id, user_ids in channel_user_ids.items()))
+    
+    logger.info("Match %s alerts: %d/%d sent", ", ".join(map(str, match_nos)), successful_sends, len(users_with_alerts))
+    return failed
 
 # Add alert checking task
 async def check_match_alerts():
-    """Check for upcoming matches and send alerts at 3 PM and 7 PM IST"""
+    """Sleep until each match's alert time and send alerts 30 minutes before the start"""
+    clock_resolution = time.get_clock_info('monotonic').resolution
+    attempt = 0
+    # Recipients still owed the alert for a batch of matches after a transient send failure
+    pending_matches: Tuple[int, ...] = ()
+    pending_recipients: Dict[int, Optional[int]] = {}
     while True:
         try:
-            # Get current time in IST
-            current_time = get_ist_time()
-            current_hour = current_time.hour
+            # Find the next match that has not started yet and has not been alerted
+            now_epoch = time.time()
+            i = bisect.bisect_right(ALERT_EVENTS, (int(now_epoch) - ALERT_LEAD_TIME, sys.maxsize))
+            while i < len(ALERT_EVENTS) and ALERT_EVENTS[i][1] in _alerted_matches:
+                i += 1
+            if i == len(ALERT_EVENTS):
+                logger.info("No upcoming match alerts, stopping alert task")
+                return
             
-            # Only check at 3 PM and 7 PM IST
-            if current_hour not in [15, 19]:  # 15 = 3 PM, 19 = 7 PM IST
-                # Sleep until next check time
-                if current_hour < 15:
-                    sleep_until = current_time.replace(hour=15, minute=0, second=0, microsecond=0)
-                elif current_hour < 19:
-                    sleep_until = current_time.replace(hour=19, minute=0, second=0, microsecond=0)
-                else:
-                    # If past 7 PM, sleep until 3 PM next day
-                    sleep_until = (current_time + timedelta(days=1)).replace(hour=15, minute=0, second=0, microsecond=0)
-                
-                sleep_seconds = (sleep_until - current_time).total_seconds()
-                logger.info(f"Sleeping until {sleep_until} ({sleep_seconds} seconds)")
-                await asyncio.sleep(sleep_seconds)
+            alert_epoch, match_no = ALERT_EVENTS[i]
+            delay = alert_epoch - now_epoch
+            if delay > 0:
+                logger.info("Next alert for Match %d in %d seconds", match_no, delay)
+                # Sleep on the monotonic clock in bounded steps so wall-clock jumps (NTP, manual changes)
+                # are picked up on the next iteration; pad by the clock resolution so we never wake up
+                # just before the alert time
+                await sleep_or_alerts_changed(min(delay, ALERT_MAX_SLEEP) + clock_resolution)
                 continue
             
-            logger.info(f"Checking alerts at {current_time}")
+            # Batch every match whose alert is due into a single message
+            due_matches = [
+                match_no for alert_epoch, match_no in ALERT_EVENTS[i:]
+                if alert_epoch <= now_epoch and match_no not in _alerted_matches
+            ]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sending alerts for matches %s at %s", due_matches, get_ist_time())
             
-            # Get users with alerts enabled
-            users_with_alerts = get_users_with_alerts()
-            if not users_with_alerts:
-                await asyncio.sleep(3600)  # Sleep for 1 hour if no alerts
-                continue
-            
-            # Check each match in the schedule
-            for match_no, match_info in IPL_2025_SCHEDULE.items():
-                try:
-                    # Check if alert is enabled for this match
-                    if not match_info.get('alert', False):
-                        continue
-                        
-                    # Parse match start time (already in IST)
-                    match_date = match_info['date']
-                    start_time = datetime.strptime(match_info['start'], '%H:%M').time()
-                    match_datetime = datetime.combine(match_date, start_time)
-                    
-                    # Only send alerts for matches today
-                    if match_date.date() != current_time.date():
-                        continue
-                    
-                    # Get team acronyms
-                    home_team = TEAM_ACRONYMS.get(match_info['home'].strip(), match_info['home'].strip())
-                    away_team = TEAM_ACRONYMS.get(match_info['away'].strip(), match_info['away'].strip())
-                    
-                    # Create alert message
-                    alert_message = (
-                        f"🔔 Match Alert!\n"
-                        f"Match {match_no}: {home_team} vs {away_team}\n"
-                        f"Starting at {match_info['start']} IST!\n"
-                        f"Venue: {match_info['venue']}"
-                    )
-                    
-                    # Send alert to each user
-                    for user_id in users_with_alerts:
-                        try:
-                            user = await client.fetch_user(user_id)
-                            if user:
-                                await user.send(alert_message)
-                                logger.info(f"Sent alert to user {user_id} for Match {match_no}")
-                        except Exception as e:
-                            logger.error(f"Error sending alert to user {user_id}: {str(e)}")
-                            
-                except Exception as e:
-                    logger.error(f"Error processing match {match_no}: {str(e)}")
+            if tuple(due_matches) == pending_matches:
+                # Retry only the recipients whose alert failed last time
+                users_with_alerts = pending_recipients
+            else:
+                users_with_alerts = await asyncio.to_thread(cached_users_with_alerts)
+                if not users_with_alerts:
+                    # Nobody to alert yet; wait for someone to opt in or for the first match to start
+                    await sleep_or_alerts_changed(IPL_2025_SCHEDULE[due_matches[0]].epoch - time.time())
                     continue
             
-            # Sleep for 1 hour before next check
-            await asyncio.sleep(3600)
+            failed = await send_match_alerts(due_matches, users_with_alerts)
+            if failed:
+                # Keep the matches unalerted and retry until delivered or the match starts
+                pending_matches, pending_recipients = tuple(due_matches), failed
+                attempt += 1
+                backoff = min(60, 2 ** attempt)
+                logger.warning("%d alert(s) failed, retrying in %s seconds", len(failed), backoff)
+                await asyncio.sleep(backoff)
+                continue
             
+            _alerted_matches.update(due_matches)
+            pending_matches, pending_recipients = (), {}
+            attempt = 0
+            
+        except (discord.HTTPException, asyncio.TimeoutError, DatabaseError) as e:
+            # Transient network or database failure; back off and retry
+            attempt += 1
+            backoff = min(60, 2 ** attempt)
+            logger.error("Error in alert checking task, retrying in %s seconds: %s", backoff, e)
+            await asyncio.sleep(backoff)
         except Exception as e:
-            logger.error(f"Error in alert checking task: {str(e)}")
-            await asyncio.sleep(60)  # Wait a minute before retrying
+            # Programming error; let the task die so the done callback can restart it
+            logger.error("Unexpected error in alert checking task: %s", e)
+            raise
+
+# Running alert task, restarted after a crash
+_alert_task: Optional[asyncio.Task] = None
+ALERT_RESTART_DELAY = 60  # seconds
+
+def start_alert_task():
+    """Start the alert checking task and restart it if it crashes"""
+    global _alert_task
+    # on_ready (after a reconnect) and a pending crash restart may both get here;
+    # only one alert loop may run or matches would be alerted twice
+    if _alert_task is not None and not _alert_task.done():
+        return
+    _alert_task = client.loop.create_task(check_match_alerts())
+    _alert_task.add_done_callback(restart_alert_task)
+
+def restart_alert_task(task: asyncio.Task):
+    """Restart the alert task after a delay if it exited with an exception"""
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.error("Alert checking task crashed, restarting in %s seconds", ALERT_RESTART_DELAY, exc_info=False)
+    client.loop.call_later(ALERT_RESTART_DELAY, start_alert_task)
+
+@client.event
+async def setup_hook():
+    """Create loop-bound asyncio primitives once the client's event loop is running"""
+    global _alerts_changed, _handler_semaphore
+    _alerts_changed = asyncio.Event()
+    _handler_semaphore = asyncio.Semaphore(HANDLER_CONCURRENCY)
+
+# The bot's own user id, captured once logged in so on_message can skip its own messages
+BOT_USER_ID: Optional[int] = None
 
 @client.event
 async def on_ready():
-    logger.info(f"Dream11 Bot has logged in as {client.user}")
-    logger.info(f"Bot is in {len(client.guilds)} guilds")
+    global BOT_USER_ID
+    BOT_USER_ID = client.user.id
+    logger.info("Dream11 Bot has logged in as %s", client.user)
+    logger.info("Bot is in %s guilds", len(client.guilds))
     
     # Check DM permissions
     # try:
@@ -221,471 +505,536 @@ async def on_ready():
     # except Exception as e:
     #     logger.error(f"Error checking DM permissions: {e}")
     
-    # Start the alert checking task
-    client.loop.create_task(check_match_alerts())
-    logger.info("Alert checking task started")
+    # Start the alert checking task (on_ready also fires after reconnects)
+    if _alert_task is None or _alert_task.done():
+        start_alert_task()
+        logger.info("Alert checking task started")
 
-@client.event
-async def on_message(message):
-    if message.author == client.user:
+async def handle_win(message):
+    """Add a point to a user for winning a match"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "win"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
         return
 
-    # Check rate limit
-    if not check_rate_limit(message.author.id):
-        await message.channel.send("⚠️ You're using commands too quickly. Please wait a moment.")
+    # Parse command
+    parts = message.content.split(None, 2)
+    if len(parts) < 3:
+        await message.channel.send("❌ Invalid command format. Use: !win @username match_number")
         return
 
-    # Check for command cooldown
-    global last_command_time
-    current_time = time.time()
-    if current_time - last_command_time < Config.COMMAND_COOLDOWN:
+    # Extract username and match number
+    _, username, match_str = parts
+    admin = is_admin(message.author)
+    try:
+        match_number = int(match_str.split(None, 1)[0])
+    except ValueError:
+        await message.channel.send("❌ Invalid match number. Please provide a valid number.")
         return
-    last_command_time = current_time
 
-    try:
-        if message.content.startswith("!win"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "win"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+    # Validate username format
+    if not username.startswith('<@') or not username.endswith('>'):
+        await message.channel.send("❌ Invalid username format. Please mention the user using @.")
+        return
 
-            # Parse command
-            parts = message.content.split()
-            if len(parts) != 3:
-                await message.channel.send("❌ Invalid command format. Use: !win @username match_number")
-                return
+    # Check if user is admin
+    if not admin:
+        # For non-admin users:
+        # 1. Check if a winner has already been recorded for this match
+        if has_used_win_today(match_number):
+            await message.channel.send(f"❌ A winner has already been recorded for Match {match_number}.")
+            return
 
-            # Extract username and match number
-            username = parts[1]
-            try:
-                match_number = int(parts[2])
-            except ValueError:
-                await message.channel.send("❌ Invalid match number. Please provide a valid number.")
-                return
+        # 2. Check if the match is scheduled for today
+        if not is_match_today(match_number, IPL_2025_SCHEDULE):
+            await message.channel.send("❌ You can only record wins for matches scheduled for today.")
+            return
 
-            # Validate username format
-            if not username.startswith('<@') or not username.endswith('>'):
-                await message.channel.send("❌ Invalid username format. Please mention the user using @.")
-                return
+    # Update points
+    await update_points(username, 1, match_number, message.author.name)
+    bump_stats_version()
+    await message.channel.send(f"✅ Added 1 point to {username} for Match {match_number}")
 
-            # Check if user is admin
-            if not is_admin(message.author):
-                # For non-admin users:
-                # 1. Check if they've already used the command today
-                if has_used_win_today(message.author.id):
-                    await message.channel.send("❌ You can only use the !win command once per day.")
-                    return
-
-                # 2. Check if the match is scheduled for today
-                if not is_match_today(match_number, IPL_2025_SCHEDULE):
-                    await message.channel.send("❌ You can only record wins for matches scheduled for today.")
-                    return
-
-            # Update points
-            await update_points(username, 1, match_number, message.author.name)
-            await message.channel.send(f"✅ Added 1 point to {username} for Match {match_number}")
-
-        elif message.content.startswith("!d11"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "d11"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+async def handle_d11(message):
+    """Show the leaderboard and recent match winners"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "d11"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
 
-            try:
-                # Get points and match results
-                points = get_points()
-                match_results = get_match_results()
-                
-                # Format leaderboard
-                leaderboard = "🏆 Dream11 Leaderboard 🏆\n\n"
-                if points:
-                    sorted_users = sorted(points.items(), key=lambda x: x[1], reverse=True)
-                    for rank, (user, points) in enumerate(sorted_users, 1):
-                        leaderboard += f"{rank}. {format_username(user)}: {points} point(s)\n"
+    try:
+        # Get points (already sorted by the database) and match results
+        leaderboard = await asyncio.to_thread(get_leaderboard)
+        recent_matches = await asyncio.to_thread(get_recent_match_results, 5)
+        
+        # Format leaderboard
+        lines = ["🏆 Dream11 Leaderboard 🏆", ""]
+        if leaderboard:
+            lines.extend(
+                f"{rank}. {format_username(user)}: {user_points} point(s)"
+                for rank, (user, user_points) in enumerate(leaderboard, 1)
+            )
+        else:
+            lines.append("No points recorded yet!")
+        
+        # Send leaderboard first
+        await message.channel.send("\n".join(lines))
+        
+        # Add recent match results section if there are results
+        if recent_matches:
+            # Create header for recent matches
+            match_log = [
+                "🏆 Recent Match Winners 🏆",
+                "",
+                "Match #     Match Details                    Winner",
+                "-" * 70
+            ]
+            
+            # Add matches
+            for match_no, winner, _, _ in recent_matches:
+                # Get match details from schedule
+                match_info = IPL_2025_SCHEDULE.get(match_no)
+                if match_info:
+                    match_details = match_info.match_details
                 else:
-                    leaderboard += "No points recorded yet!\n"
-                
-                # Send leaderboard first
-                await message.channel.send(leaderboard)
+                    match_details = "Unknown Teams"
                 
-                # Add recent match results section if there are results
-                if match_results:
-                    # Sort match results by match number in descending order and take last 5
-                    sorted_matches = sorted(match_results, key=lambda x: x[0], reverse=True)[:5]
-                    
-                    # Create header for recent matches
-                    match_log = "🏆 Recent Match Winners 🏆\n\n"
-                    match_log += "Match #     Match Details                    Winner\n"
-                    match_log += "-" * 70 + "\n"
-                    
-                    # Add matches
-                    for match_no, winner, _, _ in sorted_matches:
-                        # Get match details from schedule
-                        match_info = IPL_2025_SCHEDULE.get(match_no, {})
-                        if match_info:
-                            home_team = TEAM_ACRONYMS.get(match_info['home'].strip(), match_info['home'].strip())
-                            away_team = TEAM_ACRONYMS.get(match_info['away'].strip(), match_info['away'].strip())
-                            match_details = f"{home_team} vs {away_team}"
-                        else:
-                            match_details = "Unknown Teams"
-                        
-                        # Format the line with proper spacing
-                        match_log += f"Match {match_no:<5} {match_details:<30} {format_username(winner)}\n"
-                    
-                    # Send the recent matches
-                    await message.channel.send(match_log)
-                
-            except Exception as e:
-                logger.error(f"Error displaying leaderboard: {str(e)}")
-                error_message = "❌ Error displaying leaderboard. "
-                if "Failed to access" in str(e):
-                    error_message += "Database connection error. Please check your Supabase configuration."
-                elif "Failed to get points" in str(e):
-                    error_message += "Unable to fetch points data."
-                elif "Failed to get match results" in str(e):
-                    error_message += "Unable to fetch match results."
-                else:
-                    error_message += "Please try again later."
-                await message.channel.send(error_message)
+                # Format the line with proper spacing
+                match_log.append(f"Match {match_no:<5} {match_details:<30} {format_username(winner)}")
+            
+            # Send the recent matches
+            await message.channel.send("\n".join(match_log))
+        
+    except Exception as e:
+        logger.error("Error displaying leaderboard: %s", e)
+        error_message = "❌ Error displaying leaderboard. "
+        if "Failed to access" in str(e):
+            error_message += "Database connection error. Please check your Supabase configuration."
+        elif "Failed to get points" in str(e):
+            error_message += "Unable to fetch points data."
+        elif "Failed to get match results" in str(e):
+            error_message += "Unable to fetch match results."
+        else:
+            error_message += "Please try again later."
+        await message.channel.send(error_message)
 
-        elif message.content.startswith("!undo"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "undo"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+async def handle_undo(message):
+    """Undo the last points update (admin only)"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "undo"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
 
-            # Check if user is admin
-            if not is_admin(message.author):
-                await message.channel.send("❌ This command is restricted to admin users only.")
-                return
-                
-            success, message_text = undo_last_points_update()
-            if success:
-                await message.channel.send(f"✅ {message_text}")
-            else:
-                await message.channel.send(f"❌ {message_text}")
+    # Check if user is admin
+    if not is_admin(message.author):
+        await message.channel.send("❌ This command is restricted to admin users only.")
+        return
+        
+    success, message_text = await asyncio.to_thread(undo_last_points_update)
+    bump_stats_version()
+    if success:
+        await message.channel.send(f"✅ {message_text}")
+    else:
+        await message.channel.send(f"❌ {message_text}")
 
-        elif message.content.startswith("!clearpoints"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "clearpoints"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+async def handle_clearpoints(message):
+    """Clear all points (admin only)"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "clearpoints"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
 
-            # Check if user is admin
-            if not is_admin(message.author):
-                await message.channel.send("❌ This command is restricted to admin users only.")
-                return
+    # Check if user is admin
+    if not is_admin(message.author):
+        await message.channel.send("❌ This command is restricted to admin users only.")
+        return
 
-            clear_points()
-            await message.channel.send("✅ All Dream11 points have been cleared successfully.")
+    await asyncio.to_thread(clear_points)
+    bump_stats_version()
+    await message.channel.send("✅ All Dream11 points have been cleared successfully.")
 
-        elif message.content.startswith("!adminlog"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "adminlog"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+async def handle_adminlog(message):
+    """Show the detailed match results log (admin only)"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "adminlog"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
 
-            # Check if user is admin
-            if not is_admin(message.author):
-                await message.channel.send("❌ This command is restricted to admin users only.")
-                return
+    # Check if user is admin
+    if not is_admin(message.author):
+        await message.channel.send("❌ This command is restricted to admin users only.")
+        return
+        
+    try:
+        match_results = await asyncio.to_thread(get_match_results)
+        if not match_results:
+            await message.channel.send("No match results recorded yet!")
+        else:
+            # Results arrive ordered by match number; split into chunks of 10 for better readability
+            chunk_size = 10
+            for i in range(0, len(match_results), chunk_size):
+                chunk = match_results[i:i + chunk_size]
                 
-            try:
-                match_results = get_match_results()
-                if not match_results:
-                    await message.channel.send("No match results recorded yet!")
+                # Create header for this chunk
+                if i > 0:
+                    output = ["📊 Detailed Match Results Log (Continued):", ""]
                 else:
-                    # Sort match results by match number
-                    sorted_matches = sorted(match_results, key=lambda x: x[0])
+                    output = ["📊 Detailed Match Results Log:", ""]
+                
+                # Add matches for this chunk
+                for match_no, winner, timestamp, admin in chunk:
+                    # Get match details from schedule
+                    match_info = IPL_2025_SCHEDULE.get(match_no)
+                    if match_info:
+                        match_details = match_info.match_details
+                    else:
+                        match_details = "Unknown Teams"
                     
-                    # Split matches into chunks of 10 for better readability
-                    chunk_size = 10
-                    for i in range(0, len(sorted_matches), chunk_size):
-                        chunk = sorted_matches[i:i + chunk_size]
-                        
-                        # Create header for this chunk
-                        output = "📊 Detailed Match Results Log:\n\n"
-                        if i > 0:
-                            output = f"📊 Detailed Match Results Log (Continued):\n\n"
-                        
-                        # Add matches for this chunk
-                        for match_no, winner, timestamp, admin in chunk:
-                            # Get match details from schedule
-                            match_info = IPL_2025_SCHEDULE.get(match_no, {})
-                            if match_info:
-                                home_team = TEAM_ACRONYMS.get(match_info['home'].strip(), match_info['home'].strip())
-                                away_team = TEAM_ACRONYMS.get(match_info['away'].strip(), match_info['away'].strip())
-                                match_details = f"{home_team} vs {away_team}"
-                            else:
-                                match_details = "Unknown Teams"
-                            
-                            output += f"Match: {match_no}\n"
-                            output += f"Teams: {match_details}\n"
-                            output += f"Winner: {format_username(winner)}\n"
-                            output += f"Recorded by: {admin}\n"
-                            output += f"Timestamp: {timestamp}\n"
-                            output += "-" * 30 + "\n"
-                        
-                        # Send the chunk
-                        await message.channel.send(output)
-                        
-            except Exception as e:
-                logger.error(f"Error reading match results: {str(e)}")
-                error_message = "❌ Error reading match results. "
-                if "Failed to access" in str(e):
-                    error_message += "Database connection error. Please check your Supabase configuration."
-                elif "Failed to get match results" in str(e):
-                    error_message += "Unable to fetch match results data."
-                else:
-                    error_message += "Please try again later."
-                await message.channel.send(error_message)
+                    output.extend((
+                        f"Match: {match_no}",
+                        f"Teams: {match_details}",
+                        f"Winner: {format_username(winner)}",
+                        f"Recorded by: {admin}",
+                        f"Timestamp: {timestamp}",
+                        "-" * 30
+                    ))
+                
+                # Send the chunk
+                await message.channel.send("\n".join(output))
+                
+    except Exception as e:
+        logger.error("Error reading match results: %s", e)
+        error_message = "❌ Error reading match results. "
+        if "Failed to access" in str(e):
+            error_message += "Database connection error. Please check your Supabase configuration."
+        elif "Failed to get match results" in str(e):
+            error_message += "Unable to fetch match results data."
+        else:
+            error_message += "Please try again later."
+        await message.channel.send(error_message)
 
-        elif message.content.startswith("!tdy"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "tdy"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+async def handle_tdy(message):
+    """Show today's scheduled matches"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "tdy"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
 
-            # Get current date in IST
-            current_time = get_ist_time()
-            current_date = current_time.date()
-            
-            # Find matches scheduled for today
-            today_matches = []
-            for match_no, match_info in IPL_2025_SCHEDULE.items():
-                if match_info['date'].date() == current_date:
-                    # Get team acronyms
-                    home_team = match_info['home'].strip()
-                    away_team = match_info['away'].strip()
-                    home_acronym = TEAM_ACRONYMS.get(home_team, home_team)
-                    away_acronym = TEAM_ACRONYMS.get(away_team, away_team)
-                    
-                    today_matches.append({
-                        'match_no': match_no,
-                        'home': home_acronym,
-                        'away': away_acronym,
-                        'start': match_info['start']
-                    })
-            
-            if not today_matches:
-                await message.channel.send("No matches scheduled for today.")
-                return
-                
-            # Create output message
-            output = "🏏 Today's Matches 🏏\n\n"
-            output += "Match #" + " " * 5 + "Teams" + " " * 20 + "Start Time\n"
-            output += "-" * 50 + "\n"
-            
-            # Sort matches by match number
-            today_matches.sort(key=lambda x: x['match_no'])
-            
-            for match in today_matches:
-                output += f"Match {match['match_no']:<5} {match['home']} vs {match['away']:<15} {match['start']} IST\n"
-            
-            await message.channel.send(output)
+    # Get current date in IST
+    current_date = get_ist_date()
+    
+    # Find matches scheduled for today
+    today_matches = []
+    for match_no in matches_on(current_date):
+        match_info = IPL_2025_SCHEDULE[match_no]
+        today_matches.append({
+            'match_no': match_no,
+            'home': match_info.home_acr,
+            'away': match_info.away_acr,
+            'start': match_info.start
+        })
+    
+    if not today_matches:
+        await message.channel.send("No matches scheduled for today.")
+        return
+        
+    # Create output message
+    output = [
+        "🏏 Today's Matches 🏏",
+        "",
+        "Match #" + " " * 5 + "Teams" + " " * 20 + "Start Time",
+        "-" * 50
+    ]
+    
+    # Sort matches by match number
+    today_matches.sort(key=lambda x: x['match_no'])
+    
+    output.extend(
+        f"Match {match['match_no']:<5} {match['home']} vs {match['away']:<15} {match['start']} IST"
+        for match in today_matches
+    )
+    
+    await message.channel.send("\n".join(output))
 
-        elif message.content.startswith("!about"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "about"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+def build_about_embed() -> discord.Embed:
+    """Build the !about help embed"""
+    # Create an embed message
+    embed = discord.Embed(
+        title="📋 Dream11 Bot Commands",
+        description="Here is the list of Dream11 commands you can use:",
+        color=discord.Color.blue()
+    )
+    
+    # Add fields for regular commands
+    embed.add_field(
+        name="Regular Commands",
+        value="These commands are available to all users:",
+        inline=False
+    )
+    embed.add_field(
+        name="1. `!win <username> <match_number>`",
+        value="Add 1 point to a user for winning a match\nYou can use @mentions or regular usernames",
+        inline=False
+    )
+    embed.add_field(
+        name="2. `!d11`",
+        value="Show Dream11 leaderboard and match winners log",
+        inline=False
+    )
+    embed.add_field(
+        name="3. `!tdy`",
+        value="Show today's scheduled matches",
+        inline=False
+    )
+    embed.add_field(
+        name="4. `!alert`",
+        value="Toggle match alerts (30 minutes before each match)\nUse `!alert here` to be alerted in the current channel instead of by DM",
+        inline=False
+    )
+    embed.add_field(
+        name="5. `!mystats`",
+        value="Show your personal stats (points and alert status)",
+        inline=False
+    )
+    embed.add_field(
+        name="6. `!about`",
+        value="Show this help message",
+        inline=False
+    )
+    
+    # Add separator
+    embed.add_field(
+        name="\u200b",  # Zero-width space for visual separation
+        value="\u200b",
+        inline=False
+    )
+    
+    # Add fields for admin commands
+    embed.add_field(
+        name="Admin Commands",
+        value="These commands are restricted to admin users only:",
+        inline=False
+    )
+    embed.add_field(
+        name="1. `!undo`",
+        value="Undo last point change",
+        inline=False
+    )
+    embed.add_field(
+        name="2. `!clearpoints`",
+        value="Clear all points",
+        inline=False
+    )
+    embed.add_field(
+        name="3. `!adminlog`",
+        value="Show detailed match results log",
+        inline=False
+    )
 
-            # Create an embed message
-            embed = discord.Embed(
-                title="📋 Dream11 Bot Commands",
-                description="Here is the list of Dream11 commands you can use:",
-                color=discord.Color.blue()
-            )
+    # Footer with developer credit
+    embed.set_footer(text="Developed by Pr😉")
+
+    return embed
+
+# The help text is static, so build the embed once
+ABOUT_EMBED = build_about_embed()
+
+async def handle_about(message):
+    """Show the help message"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "about"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
+
+    # Send the embed message
+    await message.channel.send(embed=ABOUT_EMBED)
+
+async def handle_alert(message):
+    """Toggle match alerts for the user (`!alert here` posts them in the current channel)"""
+    # Check command cooldown
+    if not get_command_cooldown(message.author.id, "alert"):
+        await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
+        return
+
+    try:
+        parts = message.content.split(None, 2)
+        in_channel = len(parts) > 1 and parts[1].lower() == "here" and message.guild is not None
+        
+        if in_channel:
+            # Always enable, alerting in this channel
+            new_preference = True
+            channel_id = message.channel.id
+        else:
+            # Get current preference
+            current_preference = await asyncio.to_thread(get_user_alert_preference, message.author.id)
+            logger.info("Current alert preference for user %s: %s", message.author.id, current_preference)
             
-            # Add fields for regular commands
-            embed.add_field(
-                name="Regular Commands",
-                value="These commands are available to all users:",
-                inline=False
-            )
-            embed.add_field(
-                name="1. `!win <username> <match_number>`",
-                value="Add 1 point to a user for winning a match\nYou can use @mentions or regular usernames",
-                inline=False
-            )
-            embed.add_field(
-                name="2. `!d11`",
-                value="Show Dream11 leaderboard and match winners log",
-                inline=False
-            )
-            embed.add_field(
-                name="3. `!tdy`",
-                value="Show today's scheduled matches",
-                inline=False
-            )
-            embed.add_field(
-                name="4. `!alert`",
-                value="Toggle match alerts (30 minutes before each match)",
-                inline=False
+            # Toggle the preference
+            new_preference = not current_preference
+            channel_id = None
+        
+        await asyncio.to_thread(set_user_alert_preference, message.author.id, new_preference, channel_id)
+        bump_alerts_version()  # Force refresh on next alert check
+        bump_stats_version()
+        _alerts_changed.set()
+        logger.info("Updated alert preference for user %s to: %s (channel %s)", message.author.id, new_preference, channel_id)
+        
+        # Send confirmation message
+        if in_channel:
+            await message.channel.send(
+                "✅ Match alerts enabled! You will be mentioned in this channel 30 minutes before each match starts.\n"
+                "Use `!alert` to disable alerts."
             )
-            embed.add_field(
-                name="5. `!mystats`",
-                value="Show your personal stats (points and alert status)",
-                inline=False
+        elif new_preference:
+            await message.channel.send(
+                "✅ Match alerts enabled! You will receive a DM 30 minutes before each match starts.\n"
+                "Use `!alert` again to disable alerts, or `!alert here` to be alerted in a channel instead."
             )
-            embed.add_field(
-                name="6. `!about`",
-                value="Show this help message",
-                inline=False
+        else:
+            await message.channel.send(
+                "✅ Match alerts disabled! You will no longer receive match alerts.\n"
+                "Use `!alert` again to enable alerts."
             )
             
-            # Add separator
-            embed.add_field(
-                name="\u200b",  # Zero-width space for visual separation
-                value="\u200b",
-                inline=False
-            )
+    except DatabaseError as e:
+        logger.error("Database error in alert command: %s", e)
+        await message.channel.send(
+            "❌ Error updating alert preference. Database error occurred.\n"
+            "Please try again later or contact an admin if the issue persists."
+        )
+    except Exception as e:
+        logger.error("Unexpected error in alert command: %s", e)
+        await message.channel.send(
+            "❌ An unexpected error occurred while updating alert preference.\n"
+            "Please try again later or contact an admin if the issue persists."
+        )
+
+async def handle_mystats(message):
+    """Show the user's personal stats"""
+    try:
+        logger.info("Processing mystats command for user %s", message.author.name)
+        
+        # Get user stats
+        stats = await asyncio.to_thread(cached_user_stats, message.author.id)
+        points = stats[0][0]  # Get points
+        alert_status = stats[0][1]  # Get alert status
+        recent_wins = stats[0][2]  # Get recent wins
+        
+        # Create embed
+        embed = discord.Embed(
+            title=f"{message.author.name}'s Stats",
+            color=discord.Color.blue()
+        )
+        
+        # Add points
+        embed.add_field(
+            name="Total Points",
+            value='🥇'+str(points),
+            inline=True
+        )
+        
+        # Add alert status
+        alert_text = "✅ Enabled" if alert_status else "❌ Disabled"
+        embed.add_field(
+            name="Match Alerts",
+            value=alert_text,
+            inline=True
+        )
+        
+        # Add recent match wins if any
+        if recent_wins:
+            wins_text = ""
+            for match_no, _, timestamp in recent_wins:
+                # Get match details from schedule
+                match_info = IPL_2025_SCHEDULE.get(match_no)
+                if match_info:
+                    match_details = match_info.match_details
+                else:
+                    match_details = "Unknown Teams"
+                
+                # Format date in IST
+                win_date = convert_to_ist(datetime.fromisoformat(timestamp)).date().isoformat()
+                
+                wins_text += f"**Match {match_no}**: {match_details}\n"
+                wins_text += f"Date: {win_date}\n\n"
             
-            # Add fields for admin commands
-            embed.add_field(
-                name="Admin Commands",
-                value="These commands are restricted to admin users only:",
-                inline=False
-            )
-            embed.add_field(
-                name="1. `!undo`",
-                value="Undo last point change",
-                inline=False
-            )
             embed.add_field(
-                name="2. `!clearpoints`",
-                value="Clear all points",
+                name="Recent Wins",
+                value=wins_text,
                 inline=False
             )
+        else:
             embed.add_field(
-                name="3. `!adminlog`",
-                value="Show detailed match results log",
+                name="Recent Wins",
+                value="No matches won yet!",
                 inline=False
             )
+        
+        await message.channel.send(embed=embed)
+        
+    except Exception as e:
+        logger.error("Error processing mystats command: %s", e)
+        await message.channel.send("❌ Failed to get your stats. Please try again later.")
 
-            # Footer with developer credit
-            embed.set_footer(text="Developed by Pr😉")
+# Command prefix to handler mapping
+COMMAND_HANDLERS = {
+    "!win": handle_win,
+    "!d11": handle_d11,
+    "!undo": handle_undo,
+    "!clearpoints": handle_clearpoints,
+    "!adminlog": handle_adminlog,
+    "!tdy": handle_tdy,
+    "!about": handle_about,
+    "!alert": handle_alert,
+    "!mystats": handle_mystats
+}
 
-            # Send the embed message
-            await message.channel.send(embed=embed)
+# discord.py runs each on_message in its own task; bound how many handlers
+# hit the database at once and keep each user's commands ordered
+HANDLER_CONCURRENCY = 16
+_handler_semaphore: Optional[asyncio.Semaphore] = None  # Created in setup_hook
+_user_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
 
-        elif message.content.startswith("!alert"):
-            # Check command cooldown
-            if not get_command_cooldown(message.author.id, "alert"):
-                await message.channel.send(f"⏳ Please wait {Config.COMMAND_COOLDOWN} seconds before using this command again.")
-                return
+def get_user_lock(user_id: int) -> asyncio.Lock:
+    """Get the lock serializing a user's commands (dropped once no command holds it)"""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
 
-            try:
-                # Get current preference
-                current_preference = get_user_alert_preference(message.author.id)
-                logger.info(f"Current alert preference for user {message.author.id}: {current_preference}")
-                
-                # Toggle the preference
-                new_preference = not current_preference
-                set_user_alert_preference(message.author.id, new_preference)
-                logger.info(f"Updated alert preference for user {message.author.id} to: {new_preference}")
-                
-                # Send confirmation message
-                if new_preference:
-                    await message.channel.send(
-                        "✅ Match alerts enabled! You will receive a DM 30 minutes before each match starts.\n"
-                        "Use `!alert` again to disable alerts."
-                    )
-                else:
-                    await message.channel.send(
-                        "✅ Match alerts disabled! You will no longer receive match alerts.\n"
-                        "Use `!alert` again to enable alerts."
-                    )
-                    
-            except DatabaseError as e:
-                logger.error(f"Database error in alert command: {str(e)}")
-                await message.channel.send(
-                    "❌ Error updating alert preference. Database error occurred.\n"
-                    "Please try again later or contact an admin if the issue persists."
-                )
-            except Exception as e:
-                logger.error(f"Unexpected error in alert command: {str(e)}")
-                await message.channel.send(
-                    "❌ An unexpected error occurred while updating alert preference.\n"
-                    "Please try again later or contact an admin if the issue persists."
-                )
+@client.event
+async def on_message(message):
+    if message.author.id == BOT_USER_ID:
+        return
 
-        elif message.content.startswith("!mystats"):
-            try:
-                logger.info(f"Processing mystats command for user {message.author.name}")
-                
-                # Get user stats
-                stats = get_user_stats(message.author.id)
-                points = stats[0][0]  # Get points
-                alert_status = stats[0][1]  # Get alert status
-                recent_wins = stats[0][2]  # Get recent wins
-                
-                # Create embed
-                embed = discord.Embed(
-                    title=f"{message.author.name}'s Stats",
-                    color=discord.Color.blue()
-                )
-                
-                # Add points
-                embed.add_field(
-                    name="Total Points",
-                    value='🥇'+str(points),
-                    inline=True
-                )
-                
-                # Add alert status
-                alert_text = "✅ Enabled" if alert_status else "❌ Disabled"
-                embed.add_field(
-                    name="Match Alerts",
-                    value=alert_text,
-                    inline=True
-                )
-                
-                # Add recent match wins if any
-                if recent_wins:
-                    wins_text = ""
-                    for match_no, _, timestamp in recent_wins:
-                        # Get match details from schedule
-                        match_info = IPL_2025_SCHEDULE.get(match_no, {})
-                        if match_info:
-                            home_team = TEAM_ACRONYMS.get(match_info['home'].strip(), match_info['home'].strip())
-                            away_team = TEAM_ACRONYMS.get(match_info['away'].strip(), match_info['away'].strip())
-                            match_details = f"{home_team} vs {away_team}"
-                        else:
-                            match_details = "Unknown Teams"
-                        
-                        # Format date in IST
-                        win_date = convert_to_ist(datetime.fromisoformat(timestamp)).strftime("%Y-%m-%d")
-                        
-                        wins_text += f"**Match {match_no}**: {match_details}\n"
-                        wins_text += f"Date: {win_date}\n\n"
-                    
-                    embed.add_field(
-                        name="Recent Wins",
-                        value=wins_text,
-                        inline=False
-                    )
-                else:
-                    embed.add_field(
-                        name="Recent Wins",
-                        value="No matches won yet!",
-                        inline=False
-                    )
-                
-                await message.channel.send(embed=embed)
-                
-            except Exception as e:
-                logger.error(f"Error processing mystats command: {str(e)}")
-                await message.channel.send("❌ Failed to get your stats. Please try again later.")
+    # Look up the handler from the first token of the message
+    handler = COMMAND_HANDLERS.get(message.content.split(' ', 1)[0])
+    if handler is None:
+        return
 
+    # Check rate limit
+    if not check_rate_limit(message.author.id):
+        await message.channel.send("⚠️ You're using commands too quickly. Please wait a moment.")
+        return
+
+    # Check for command cooldown
+    if not check_command_cooldown(message.author.id):
+        return
+
+    try:
+        # Commands from one user run in order; at most HANDLER_CONCURRENCY run at once
+        async with get_user_lock(message.author.id), _handler_semaphore:
+            await handler(message)
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         await message.channel.send("❌ An unexpected error occurred. Please try again later.")
 
 # Run the bot
 try:
     logger.info("Attempting to start bot with Discord token...")
-    client.run(Config.DISCORD_TOKEN)
+    # log_handler=None: discord.py records go through the root handler from setup_logging only
+    client.run(Config.DISCORD_TOKEN, log_handler=None)
 except Exception as e:
-    logger.error(f"Failed to start bot: {e}")
+    logger.error("Failed to start bot: %s", e)
     raise
\ No newline at end of file
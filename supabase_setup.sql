@@ -2,10 +2,14 @@
 CREATE TABLE IF NOT EXISTS user_alerts (
     user_id BIGINT PRIMARY KEY,
     enabled BOOLEAN DEFAULT FALSE,
+    channel_id BIGINT,  -- Post alerts in this channel instead of a DM when set
     created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
 );
 
+-- Add channel_id to tables created before channel alerts existed
+ALTER TABLE user_alerts ADD COLUMN IF NOT EXISTS channel_id BIGINT;
+
 -- Create function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -17,6 +21,44 @@ $$ language 'plpgsql'
 SECURITY DEFINER
 SET search_path = public;
 
+-- Undo the latest points update in one transaction: delete the newest history
+-- row, take its points back from the user, and report whether the match still
+-- has another recorded result
+CREATE OR REPLACE FUNCTION undo_last_points_update()
+RETURNS TABLE (
+    undone_username TEXT,
+    undone_points INTEGER,
+    undone_match_number INTEGER,
+    match_still_recorded BOOLEAN
+) AS $$
+DECLARE
+    popped history%ROWTYPE;
+BEGIN
+    DELETE FROM history
+    WHERE id = (SELECT h.id FROM history h ORDER BY h.timestamp DESC LIMIT 1)
+    RETURNING * INTO popped;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    UPDATE points p
+    SET user_points = p.user_points - popped.points
+    WHERE p.username = popped.username;
+
+    RETURN QUERY SELECT
+        popped.username::TEXT,
+        popped.points::INTEGER,
+        popped.match_number::INTEGER,
+        EXISTS (SELECT 1 FROM history h WHERE h.match_number = popped.match_number);
+END;
+$$ language 'plpgsql'
+SET search_path = public;
+
+-- Only the bot (service_role) may undo; keep it off the public /rpc endpoint
+REVOKE EXECUTE ON FUNCTION undo_last_points_update() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION undo_last_points_update() TO service_role;
+
 -- Create trigger for updated_at
 CREATE TRIGGER update_user_alerts_updated_at
     BEFORE UPDATE ON user_alerts
@@ -50,4 +92,7 @@ CREATE POLICY "Users can insert their own alert preferences"
 CREATE INDEX IF NOT EXISTS idx_user_alerts_user_id ON user_alerts(user_id);
 CREATE INDEX IF NOT EXISTS idx_history_username ON history(username);
 CREATE INDEX IF NOT EXISTS idx_history_match_number ON history(match_number);
-CREATE INDEX IF NOT EXISTS idx_match_results_winner ON match_results(winner); 
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_match_results_winner ON match_results(winner); 
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_history_username_timestamp ON history(username, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_points_user_points ON points(user_points DESC);
@@ -1,88 +1,152 @@
 import logging
-from datetime import datetime, timedelta, timezone
-from collections import defaultdict
+import logging.handlers
+from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional
 from config import Config
 import re
-import os
 import json
 import traceback
+import sys
 import asyncio
+import functools
+import time
+import random
 import pytz
+import queue
+import atexit
+from array import array
 
-# Set up logging
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# orjson is optional; fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _dumps = json.dumps
+
+# Handlers are attached once by setup_logging
 logger = logging.getLogger(__name__)
+logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+
+# Config values read on every command, bound once at import (Config is loaded
+# from the environment at startup and not changed afterwards); admin ids as a
+# set for O(1) membership checks
+_ADMIN_IDS = frozenset(Config.ADMIN_USER_IDS)
+_MAX_MATCH = Config.MAX_MATCH_NUMBER
+_MAX_CMDS = Config.MAX_COMMANDS_PER_MINUTE
+_COOLDOWN = Config.COMMAND_COOLDOWN
 
 # Rate limiting
-command_counts = defaultdict(lambda: {"count": 0, "reset_time": datetime.now()})
+# Per-user sliding windows as [per-second counts ring, last second seen] (monotonic);
+# cooldowns map to monotonic expiry times
+RATE_WINDOW = 60  # seconds
+_EMPTY_WINDOW = array('I', [0] * RATE_WINDOW)
+command_counts: Dict[int, list] = {}
 command_cooldowns = {}
+RATE_STATE_PRUNE_INTERVAL = 300  # seconds
+_rate_state_pruned_at = 0.0
 
 class StructuredLogger:
     """Enhanced logger with structured data support"""
     def __init__(self, logger):
         self.logger = logger
         
-    def _format_context(self, context: Optional[Dict[str, Any]] = None) -> str:
-        if not context:
-            return ""
-        return f" | Context: {json.dumps(context)}"
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
         
-    def info(self, message: str, context: Optional[Dict[str, Any]] = None):
-        self.logger.info(f"{message}{self._format_context(context)}")
+    # Context travels on the record (extra={'ctx': ...}) and is only serialized by
+    # ContextFormatter when the record is written; disabled levels skip all of it
+    def info(self, message: str, *args, context: Optional[Dict[str, Any]] = None):
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(message, *args, extra={'ctx': context})
         
-    def error(self, message: str, context: Optional[Dict[str, Any]] = None, exc_info: bool = True):
-        if exc_info:
+    def error(self, message: str, *args, context: Optional[Dict[str, Any]] = None, exc_info: bool = True):
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        # Only attach a traceback when called while an exception is being handled
+        exc = sys.exc_info()
+        if exc_info and exc[0] is not None:
             context = context or {}
-            context['traceback'] = traceback.format_exc()
-        self.logger.error(f"{message}{self._format_context(context)}")
+            context['traceback'] = ''.join(traceback.format_exception(*exc))
+        self.logger.error(message, *args, extra={'ctx': context})
         
-    def warning(self, message: str, context: Optional[Dict[str, Any]] = None):
-        self.logger.warning(f"{message}{self._format_context(context)}")
+    def warning(self, message: str, *args, context: Optional[Dict[str, Any]] = None):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(message, *args, extra={'ctx': context})
         
-    def debug(self, message: str, context: Optional[Dict[str, Any]] = None):
-        self.logger.debug(f"{message}{self._format_context(context)}")
+    def debug(self, message: str, *args, context: Optional[Dict[str, Any]] = None):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message, *args, extra={'ctx': context})
+
+class ContextFormatter(logging.Formatter):
+    """Formatter that appends a record's structured context as JSON"""
+    def format(self, record: logging.LogRecord) -> str:
+        formatted = super().format(record)
+        context = getattr(record, 'ctx', None)
+        if context:
+            formatted = f"{formatted} | Context: {_dumps(context)}"
+        return formatted
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that enqueues records unformatted, leaving all formatting to the listener thread"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 # Initialize structured logger
 structured_logger = StructuredLogger(logger)
 
+# Background thread that writes queued log records (started by setup_logging)
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
 def setup_logging():
     """Set up logging configuration"""
-    # Create a logger
-    logger = logging.getLogger(__name__)
-    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+    global _log_listener
     
-    # Create a console handler (for Railway logs)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(getattr(logging, Config.LOG_LEVEL))
+    # Configure the root logger so every module's logger (utils, database, ...)
+    # is written exactly once by a single handler
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, Config.LOG_LEVEL))
     
-    # Create a formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    
-    # Add the handler
-    logger.addHandler(console_handler)
+    # Repeated calls must not stack extra handlers
+    if _log_listener is None:
+        # Create a console handler (for Railway logs)
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(getattr(logging, Config.LOG_LEVEL))
+        
+        # Create a formatter
+        formatter = ContextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        console_handler.setFormatter(formatter)
+        
+        # Queue records and write them from a listener thread so the event loop never blocks on stdout
+        log_queue = queue.SimpleQueue()
+        root_logger.addHandler(_DeferredQueueHandler(log_queue))
+        _log_listener = logging.handlers.QueueListener(log_queue, console_handler, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
     
     return structured_logger
 
 def is_admin(user) -> bool:
     """Check if the user is an admin"""
-    return user.id in Config.ADMIN_USER_IDS
+    return user.id in _ADMIN_IDS
+
+# Discord mention (<@123>, <@!123>); plain @usernames are caught by startswith first
+_MENTION_RE = re.compile(r'<@!?\d+>')
 
 def is_mention(text: str) -> bool:
     """Check if text is a Discord mention"""
-    return bool(re.match(r'<@!?\d+>', text)) or text.startswith('@')
+    return text.startswith('@') or _MENTION_RE.match(text) is not None
 
+@functools.lru_cache(maxsize=256)
 def format_username(username: str) -> str:
-    """Format username for display"""
-    if is_mention(username):
-        if username.startswith('@'):
-            return username
+    """Format username for display (cached; a season sees only a few dozen users)"""
+    if username.startswith('@') or _MENTION_RE.match(username):
         return username
-    return f"@{username}"
+    return '@' + username
+
+# Plain usernames: 1-32 ASCII letters or digits
+_USERNAME_RE = re.compile(r'\A[A-Za-z0-9]{1,32}\Z')
 
 def validate_input(username: str, match_number: int) -> tuple[bool, str]:
     """Validate input parameters"""
@@ -90,12 +154,12 @@ def validate_input(username: str, match_number: int) -> tuple[bool, str]:
     if is_mention(username):
         return True, ""
     
-    # Regular username validation
-    if not username or len(username) > 32 or not username.isalnum():
+    # Regular username validation (1-32 ASCII letters/digits)
+    if not _USERNAME_RE.match(username):
         return False, "Invalid username format. Use only letters and numbers or mention a user."
     
-    if not isinstance(match_number, int) or match_number < 1 or match_number > Config.MAX_MATCH_NUMBER:
-        return False, f"Invalid match number. Must be between 1 and {Config.MAX_MATCH_NUMBER}."
+    if not 1 <= match_number <= _MAX_MATCH:
+        return False, f"Invalid match number. Must be between 1 and {_MAX_MATCH}."
     
     return True, ""
 
@@ -106,70 +170,142 @@ def format_points(points: Dict[str, int]) -> str:
     
     try:
         sorted_users = sorted(points.items(), key=lambda x: x[1], reverse=True)
-        leaderboard = "🏆 Dream11 Leaderboard 🏆\n\n"
-        
-        for rank, (user, points) in enumerate(sorted_users, 1):
-            leaderboard += f"{rank}. {format_username(user)}: {points} point(s)\n"
-        
-        return leaderboard
+        lines = ["🏆 Dream11 Leaderboard 🏆", ""]
+        _fmt = format_username
+        lines.extend(f"{rank}. {_fmt(user)}: {pts} point(s)" for rank, (user, pts) in enumerate(sorted_users, 1))
+        return "\n".join(lines)
     except Exception as e:
         logger.error(f"Error formatting points: {str(e)}")
         return "Error formatting leaderboard. Please try again later."
 
+def _prune_rate_state(now: float) -> None:
+    """Periodically drop rate-limit state for users who have gone idle"""
+    global _rate_state_pruned_at
+    if now - _rate_state_pruned_at < RATE_STATE_PRUNE_INTERVAL:
+        return
+    # A window idle for RATE_WINDOW seconds is empty, so recreating it later is equivalent
+    for uid in [uid for uid, (_, head) in command_counts.items() if now - head >= RATE_WINDOW]:
+        del command_counts[uid]
+    for key in [key for key, expiry in command_cooldowns.items() if expiry <= now]:
+        del command_cooldowns[key]
+    _rate_state_pruned_at = now
+
 def get_command_cooldown(user_id: int, command: str) -> bool:
     """Check if command is on cooldown for user"""
-    now = datetime.now()
+    now = time.monotonic()
+    _prune_rate_state(now)
     cooldown_key = f"{user_id}_{command}"
     
-    if cooldown_key in command_cooldowns:
-        if now < command_cooldowns[cooldown_key]:
-            return False
+    if now < command_cooldowns.get(cooldown_key, 0.0):
+        return False
     
-    command_cooldowns[cooldown_key] = now + timedelta(seconds=Config.COMMAND_COOLDOWN)
+    command_cooldowns[cooldown_key] = now + _COOLDOWN
     return True
 
 def check_rate_limit(user_id: int) -> bool:
-    """Check if user has exceeded rate limit"""
-    now = datetime.now()
-    user_data = command_counts[user_id]
+    """Check if user has exceeded rate limit (MAX_COMMANDS_PER_MINUTE in any sliding 60 second window)"""
+    now = time.monotonic()
+    _prune_rate_state(now)
+    second = int(now)
+    state = command_counts.get(user_id)
+    if state is None:
+        state = command_counts[user_id] = [array('I', _EMPTY_WINDOW), second]
+    window, head = state
     
-    # Reset count if time has passed
-    if now > user_data["reset_time"]:
-        user_data["count"] = 0
-        user_data["reset_time"] = now + timedelta(minutes=1)
+    # Zero the slots for the seconds that have passed since the last command
+    shift = second - head
+    if shift >= RATE_WINDOW:
+        window = state[0] = array('I', _EMPTY_WINDOW)
+    else:
+        for sec in range(head + 1, second + 1):
+            window[sec % RATE_WINDOW] = 0
+    state[1] = second
     
     # Check if user has exceeded limit
-    if user_data["count"] >= Config.MAX_COMMANDS_PER_MINUTE:
+    if sum(window) >= _MAX_CMDS:
         return False
     
-    user_data["count"] += 1
+    window[second % RATE_WINDOW] += 1
     return True
 
+class AsyncRateLimiter:
+    """Async token bucket allowing max_rate acquisitions per time_period seconds"""
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        # Created on first use so it binds to the running loop, not the one at import
+        self._lock: Optional[asyncio.Lock] = None
+        
+    async def __aenter__(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.max_rate, self._tokens + (now - self._updated) * self.max_rate / self.time_period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # Sleep until one token has been refilled
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+                
+    async def __aexit__(self, *exc_info):
+        return False
+
 def retry_on_error(max_retries: int = 3, delay: int = 1):
-    """Decorator for retrying functions on error"""
+    """Decorator for retrying functions on error with exponential backoff (supports sync and async functions)"""
     def decorator(func):
+        # Base waits double each retry (delay, 2*delay, ...); jitter is drawn per call
+        # so concurrent callers don't retry in lockstep
+        backoffs = tuple(delay * (2 ** i) for i in range(max_retries - 1))
+        
+        if not asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                for backoff in backoffs:
+                    try:
+                        return func(*args, **kwargs)
+                    except Exception:
+                        time.sleep(backoff + random.uniform(0, delay))
+                # Last attempt: let the exception propagate with its original traceback
+                return func(*args, **kwargs)
+            return sync_wrapper
+        
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
+            for backoff in backoffs:
                 try:
                     return await func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(delay * (attempt + 1))
-                    else:
-                        raise last_exception
-            return None
+                except Exception:
+                    await asyncio.sleep(backoff + random.uniform(0, delay))
+            # Last attempt: let the exception propagate with its original traceback
+            return await func(*args, **kwargs)
         return wrapper
     return decorator
 
+# Resolved once; every IST conversion reuses this tzinfo
+IST_TIMEZONE = pytz.timezone('Asia/Kolkata')
+
 def get_ist_time() -> datetime:
     """Get current time in IST"""
-    utc_time = datetime.now(timezone.utc)
-    ist_timezone = pytz.timezone('Asia/Kolkata')
-    return utc_time.astimezone(ist_timezone)
+    return datetime.now(IST_TIMEZONE)
+
+# Today's IST date, cached for at most a minute and never past IST midnight
+_ist_date_cache = {'date': None, 'expiry': 0.0}
+
+def get_ist_date() -> date:
+    """Get today's date in IST"""
+    now = time.monotonic()
+    if now >= _ist_date_cache['expiry']:
+        current_time = get_ist_time()
+        next_midnight = (current_time + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        _ist_date_cache['date'] = current_time.date()
+        _ist_date_cache['expiry'] = now + min(60, (next_midnight - current_time).total_seconds())
+    return _ist_date_cache['date']
 
 def convert_to_ist(utc_time: datetime) -> datetime:
     """Convert UTC datetime to IST"""
-    ist_timezone = pytz.timezone('Asia/Kolkata')
-    return utc_time.astimezone(ist_timezone) 
\ No newline at end of file
+    return utc_time.astimezone(IST_TIMEZONE) 
\ No newline at end of file